@@ -30,15 +30,21 @@ ANALYSIS_AGENT_SYSTEM_PROMPT = (
     "ReAct: Think (sufficient?) → Act (if insufficient, must call retrieve_tables and/or retrieve_wiki_passages; request extractions if needed) → Observe and re-evaluate."
 )
 
-analysis_agent = create_agent(llm, tools=[retrieve_tables, retrieve_wiki_passages])
+# Built once so every call sends a byte-identical prefix (system prompt + tool schemas),
+# which lets OpenAI's automatic prompt caching serve it from cache. Keep anything
+# dynamic (timestamps, per-user data, tool results) out of it.
+ANALYSIS_AGENT_SYSTEM_MESSAGE = SystemMessage(content=ANALYSIS_AGENT_SYSTEM_PROMPT)
 
-def analysis_node(state: State) -> Command[Literal["router"]]:
+analysis_agent = create_agent(
+    llm,
+    tools=[retrieve_tables, retrieve_wiki_passages],
+    system_prompt=ANALYSIS_AGENT_SYSTEM_MESSAGE,
+    name="analysis_agent",
+)
+
+async def analysis_node(state: State) -> Command[Literal["router"]]:
     """Analysis agent node that performs calculations and generates JSON-formatted responses."""
-    # Add system prompt to the state
-    messages_with_system = [SystemMessage(content=ANALYSIS_AGENT_SYSTEM_PROMPT)] + state["messages"]
-    state_with_system = {**state, "messages": messages_with_system}
-    
-    result = analysis_agent.invoke(state_with_system)
+    result = await analysis_agent.ainvoke(state)
     
     return Command(
         update={
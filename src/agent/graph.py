@@ -1,9 +1,11 @@
 from __future__ import annotations
 
+import asyncio
+from collections.abc import AsyncIterator
 from typing import Literal
 
 from langgraph.graph import StateGraph, MessagesState, START, END
-from langchain_core.messages import HumanMessage, SystemMessage
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
 from langchain_openai import ChatOpenAI
 from langchain.agents import create_agent
 from langchain_core.language_models.chat_models import BaseChatModel
@@ -17,7 +19,7 @@ from agent.analysis_agent import analysis_node
 from agent.table_agent import table_agent_node
 from agent.utils import validate_input, route
 
-# Define the graph
+# Define the graph. It is compiled once at import and reused by every request
 graph = (
     StateGraph(state_schema=State, input_schema=MessagesState)
     .add_node("validator", validate_input)
@@ -35,3 +37,42 @@ graph = (
     )
     .compile(name="New Graph")
 )
+
+
+async def run(question: str) -> dict:
+    """Answer a single question with the compiled graph."""
+    return await graph.ainvoke({"messages": [HumanMessage(content=question)]})
+
+
+async def run_batch(questions: list[str]) -> list[dict]:
+    """Answer several questions concurrently, e.g. for batch evaluation.
+
+    Nodes are async, so LLM, embedding and tool calls of different questions
+    overlap instead of running one after another.
+    """
+    return await asyncio.gather(*(run(question) for question in questions))
+
+
+async def stream(question: str) -> AsyncIterator[tuple[str, str]]:
+    """Stream the analysis agent's output tokens as they are generated.
+
+    Uses ``stream_mode="messages"``, which surfaces LLM tokens from inside
+    the worker agents; only text produced by the analysis agent is yielded,
+    so callers (e.g. an SSE endpoint) can show the answer before the graph
+    finishes. Tool-call chunks carry no text and are skipped; a model that
+    does not stream yields its whole reply as one piece.
+
+    Every analysis-agent turn is streamed, including intermediate ones (e.g.
+    extraction requests for the table agent), so each piece is yielded as
+    ``(message_id, text)``. Pieces sharing an id belong to one reply; the
+    final answer is the reply with the last id.
+    """
+    async for chunk, metadata in graph.astream(
+        {"messages": [HumanMessage(content=question)]}, stream_mode="messages"
+    ):
+        if (
+            isinstance(chunk, AIMessage)
+            and metadata.get("lc_agent_name") == "analysis_agent"
+            and chunk.text
+        ):
+            yield chunk.id, chunk.text
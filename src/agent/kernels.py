@@ -0,0 +1,33 @@
+from __future__ import annotations
+
+import numpy as np
+from numba import njit
+
+
+# The explicit signature compiles the kernel when this module is imported (at
+# server start-up) instead of on the first query; ``cache=True`` stores the
+# machine code in ``__pycache__`` so later start-ups just load it.
+@njit("int64[:](uint32[:, :], int64[:], uint32[:])", cache=True)
+def match_rows(codes: np.ndarray, cond_cols: np.ndarray, cond_vals: np.ndarray) -> np.ndarray:
+    """Return indices of rows whose encoded cells equal every condition.
+
+    Args:
+        codes: ``(num rows, num columns)`` matrix of dictionary-encoded cells.
+        cond_cols: Column index of each condition.
+        cond_vals: Encoded value each condition column must hold.
+
+    Returns:
+        Matching row indices in ascending order.
+    """
+    out = np.empty(codes.shape[0], dtype=np.int64)
+    n = 0
+    for r in range(codes.shape[0]):
+        ok = True
+        for k in range(cond_cols.shape[0]):
+            if codes[r, cond_cols[k]] != cond_vals[k]:
+                ok = False
+                break
+        if ok:
+            out[n] = r
+            n += 1
+    return out[:n]
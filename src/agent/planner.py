@@ -1,5 +1,7 @@
 from __future__ import annotations
 
+import json
+import re
 from typing import Literal
 
 from langgraph.graph import END
@@ -8,7 +10,22 @@ from langchain_core.language_models.chat_models import BaseChatModel
 from langgraph.types import Command
 from pydantic import BaseModel, Field, field_validator
 
-from agent.utils import State, llm
+from agent.utils import State, router_llm
+
+
+_JSON_OBJECT_RE = re.compile(r"\{.*\}", re.DOTALL)
+
+
+def _is_final_answer(content: str) -> bool:
+    """Check whether a message contains the analysis agent's final JSON answer."""
+    match = _JSON_OBJECT_RE.search(content)
+    if match is None:
+        return False
+    try:
+        answer = json.loads(match.group(0))
+    except ValueError:
+        return False
+    return isinstance(answer, dict) and "answer" in answer
 
 
 def make_planner_node(llm: BaseChatModel, members: list[str]):
@@ -39,11 +56,23 @@ def make_planner_node(llm: BaseChatModel, members: list[str]):
                 raise ValueError(f"next must be one of {options}, got {v}")
             return v
 
-    def planner_node(state: State) -> Command[Literal[*members, "__end__"]]:
+    # Bound once: the Router JSON schema is derived here, not on every planner turn
+    router = llm.with_structured_output(Router)
+    system_message = SystemMessage(content=system_prompt)
+
+    async def planner_node(state: State) -> Command[Literal[*members, "__end__"]]:
         """An LLM-based router that uses ReAct-style reasoning to break down tasks."""
+        # Steps fixed by the workflow are routed without an LLM call
+        last_message = state["messages"][-1]
+        if len(state["messages"]) == 1 or last_message.name == "table_agent":
+            goto = "analysis_agent"
+            return Command(goto=goto, update={"next": goto})
+        if last_message.name == "analysis_agent" and _is_final_answer(last_message.content):
+            return Command(goto=END, update={"next": END})
+
         # Add system prompt as SystemMessage
-        messages = [SystemMessage(content=system_prompt)] + state["messages"]
-        response = llm.with_structured_output(Router).invoke(messages)
+        messages = [system_message] + state["messages"]
+        response = await router.ainvoke(messages)
         goto = response.next
         if goto == "FINISH":
             goto = END
@@ -53,4 +82,4 @@ def make_planner_node(llm: BaseChatModel, members: list[str]):
 
     return planner_node
 
-answer_supervisor_node = make_planner_node(llm, ["table_agent", "analysis_agent"])
+answer_supervisor_node = make_planner_node(router_llm, ["table_agent", "analysis_agent"])
@@ -27,6 +27,9 @@ TABLE_AGENT_SYSTEM_PROMPT = (
     "Do not evaluate answers or reason about the question; if no table_uid, ask for it."
 )
 
+# Static prefix for OpenAI prompt caching, see analysis_agent.py
+TABLE_AGENT_SYSTEM_MESSAGE = SystemMessage(content=TABLE_AGENT_SYSTEM_PROMPT)
+
 table_agent = create_agent(
     llm,
     tools=[
@@ -36,15 +39,13 @@ table_agent = create_agent(
         get_column,
         get_row_by_index,
     ],
+    system_prompt=TABLE_AGENT_SYSTEM_MESSAGE,
+    name="table_agent",
 )
 
-def table_agent_node(state: State) -> Command[Literal["router"]]:
-    """Table agent node that adds system prompt and processes table-related queries."""
-    # Add system prompt to the state
-    messages_with_system = [SystemMessage(content=TABLE_AGENT_SYSTEM_PROMPT)] + state["messages"]
-    state_with_system = {**state, "messages": messages_with_system}
-    
-    result = table_agent.invoke(state_with_system)
+async def table_agent_node(state: State) -> Command[Literal["router"]]:
+    """Table agent node that processes table-related queries."""
+    result = await table_agent.ainvoke(state)
     
     return Command(
         update={
@@ -3,9 +3,11 @@ from __future__ import annotations
 from dataclasses import dataclass
 from typing import Any, Dict
 
+import numpy as np
 from langchain_core.tools import tool
 
-from agent.utils import get_storage
+from agent.kernels import match_rows
+from agent.utils import aget_storage, get_storage
 
 @tool
 def get_table_metadata(table_uid: str) -> {
@@ -69,10 +71,10 @@ def _get_column_index(table: Dict[str, Any], column_name: str) -> int:
     Raises:
         ValueError: If the column name is not found in the table header.
     """
-    for i, name in enumerate([header[0] for header in table["header"]]):
-        if name == column_name:
-            return i
-    raise ValueError(f"Column '{column_name}' not found")
+    try:
+        return table["_col_index"][column_name]
+    except KeyError:
+        raise ValueError(f"Column '{column_name}' not found") from None
 
 @tool
 def get_column(table_uid: str, column_name: str) -> {
@@ -110,7 +112,7 @@ def get_column(table_uid: str, column_name: str) -> {
 
         column_index = _get_column_index(table, column_name)
 
-        values = [row[column_index][0] for row in table["data"]]
+        values = table["_cols"][column_index].tolist()
 
         return {
             "ok": True,
@@ -263,14 +265,27 @@ def find_rows_by_value(table_uid: str, conditions: dict[str, str]) -> {
     try:
         table = get_storage().get_table(table_uid)
 
-        row_indices = []
-        for row_index, row in enumerate(table["data"]):
-            for column_name, value in conditions.items():
-                column_index = _get_column_index(table, column_name)
-                if row[column_index][0] != value:
-                    break
-                else:
-                    row_indices.append(row_index)
+        cond_idx = [
+            (_get_column_index(table, column_name), value)
+            for column_name, value in conditions.items()
+        ]
+
+        cond_cols = []
+        cond_vals = []
+        for column_index, value in cond_idx:
+            uniques = table["_uniques"][column_index]
+            code = np.searchsorted(uniques, value)
+            if code == len(uniques) or uniques[code] != value:
+                # Value never occurs in this column, so no row can match
+                return {"ok": True, "row indices": []}
+            cond_cols.append(column_index)
+            cond_vals.append(code)
+
+        row_indices = match_rows(
+            table["_codes"],
+            np.array(cond_cols, dtype=np.int64),
+            np.array(cond_vals, dtype=np.uint32),
+        ).tolist()
 
         return {
             "ok": True,
@@ -285,7 +300,7 @@ def find_rows_by_value(table_uid: str, conditions: dict[str, str]) -> {
         }
 
 @tool
-def retrieve_tables(query: str) -> {
+async def retrieve_tables(query: str) -> {
     "ok": bool,
     "table uids": list[str],
 }:
@@ -311,7 +326,7 @@ def retrieve_tables(query: str) -> {
         >>> if result[\"ok\"]:
         ...     print(result[\"table uids\"][:5])
     """
-    table_uids = get_storage().retrieve_tables(query)
+    table_uids = await (await aget_storage()).aretrieve_tables(query)
 
     return {
         "ok": True,
@@ -319,7 +334,7 @@ def retrieve_tables(query: str) -> {
     }
 
 @tool
-def retrieve_wiki_passages(query: str) -> {
+async def retrieve_wiki_passages(query: str) -> {
     "ok": bool,
     "passages texts": list[str],
 }:
@@ -347,7 +362,7 @@ def retrieve_wiki_passages(query: str) -> {
         ...     for text in result["passages texts"][:9]:
         ...         print(text[:100])
     """
-    passages = get_storage().retrieve_wiki_passages(query)
+    passages = await (await aget_storage()).aretrieve_wiki_passages(query)
 
     return {
         "ok": True,
@@ -1,16 +1,29 @@
 from __future__ import annotations
 
 from typing import Any, Dict, List
+from concurrent.futures import Future, ThreadPoolExecutor
+import asyncio
+import functools
+import mmap
 import os
+import sys
+import threading
 from datasets import load_dataset
 from pathlib import Path
 import pickle
 from git import Repo, RemoteProgress
-import json
+import faiss
+import numpy as np
+import orjson
 
 from langgraph.graph import MessagesState
+from langchain_classic.embeddings import CacheBackedEmbeddings
+from langchain_classic.storage import LocalFileStore
 from langchain_openai import ChatOpenAI, OpenAIEmbeddings
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
 from langchain_core.messages import AIMessage
+from langchain_core.stores import InMemoryByteStore
 from langchain_core.vectorstores import InMemoryVectorStore
 from langchain_community.retrievers import WikipediaRetriever
 
@@ -19,6 +32,140 @@ class State(MessagesState):
 
 
 llm = ChatOpenAI(model="gpt-4o")
+# Routing only picks the next worker, a small model is enough
+router_llm = ChatOpenAI(model="gpt-4o-mini", temperature=0)
+
+
+@functools.lru_cache(maxsize=512)
+def _load_table(path: str) -> Dict[str, Any]:
+    """Load and parse a table JSON file, memoized by path.
+
+    Tools only read the returned dict, so the cached object is shared as-is.
+    A ``_col_index`` mapping (column name -> index) is attached so column
+    lookups don't have to scan the header on every call, and ``_cols`` holds
+    the cell values column-wise (one object array per column). Cell strings
+    are interned, so repeated values share one object. For row filtering
+    every column is dictionary-encoded: ``_uniques[c]`` is the sorted array of
+    distinct values of column ``c`` and ``_codes`` is a
+    ``(num rows, num columns)`` uint32 matrix of positions in it.
+    """
+    with open(path, "rb") as f:
+        table = orjson.loads(f.read())
+
+    col_index = {}
+    for i, header in enumerate(table["header"]):
+        # Keep the first occurrence, as a linear scan of the header would
+        col_index.setdefault(header[0], i)
+    table["_col_index"] = col_index
+
+    data = table["data"]
+    for row in data:
+        for cell in row:
+            cell[0] = sys.intern(cell[0])
+    # Rows shorter than the header are padded with empty cells
+    table["_cols"] = [
+        np.array([row[c][0] if c < len(row) else "" for row in data], dtype=object)
+        for c in range(len(table["header"]))
+    ]
+
+    codes = np.empty((len(data), len(table["header"])), dtype=np.uint32)
+    uniques = []
+    for c, col in enumerate(table["_cols"]):
+        col_uniques, codes[:, c] = np.unique(col, return_inverse=True)
+        uniques.append(col_uniques)
+    table["_codes"] = codes
+    table["_uniques"] = uniques
+
+    return table
+
+
+class HNSWRetriever:
+    """Approximate nearest-neighbour retriever backed by a FAISS HNSW index.
+
+    Drop-in replacement for ``InMemoryVectorStore.as_retriever()``: the query
+    is embedded once and the top ``k`` texts are looked up in the index, which
+    avoids a full cosine scan over every stored vector on each call.
+    Vectors are L2-normalized, so the index's L2 ranking equals cosine ranking.
+    """
+    def __init__(self, index: faiss.Index, texts: List[str], embeddings: Embeddings, k: int = 4):
+        """Wrap ``index``, whose i-th vector is the embedding of ``texts[i]``."""
+        self.index = index
+        self.index.hnsw.efSearch = 64
+        self.texts = texts
+        self.embeddings = embeddings
+        self.k = k
+
+    @classmethod
+    def from_vectorstore(cls, vectorstore: InMemoryVectorStore, embeddings: Embeddings) -> HNSWRetriever:
+        """Build the index from the vectors already stored in ``vectorstore``."""
+        records = list(vectorstore.store.values())
+        vectors = np.array([record["vector"] for record in records], dtype=np.float32)
+        faiss.normalize_L2(vectors)
+
+        index = faiss.IndexHNSWFlat(vectors.shape[1], 32)
+        index.add(vectors)
+
+        return cls(index, [record["text"] for record in records], embeddings)
+
+    @classmethod
+    def load(cls, path: Path, embeddings: Embeddings) -> HNSWRetriever:
+        """Load an index saved with :meth:`dump`."""
+        index = faiss.read_index(str(path / "index.faiss"))
+        with open(str(path / "texts.pkl"), "rb") as f:
+            texts = pickle.load(f)
+        return cls(index, texts, embeddings)
+
+    def dump(self, path: Path) -> None:
+        """Save the index and its texts to the ``path`` directory."""
+        path.mkdir(parents=True, exist_ok=True)
+        faiss.write_index(self.index, str(path / "index.faiss"))
+        with open(str(path / "texts.pkl"), "wb") as f:
+            pickle.dump(self.texts, f)
+
+    def invoke(self, query: str) -> List[Document]:
+        """Return the ``k`` texts closest to ``query`` as Documents, best match first."""
+        query_vector = np.array([self.embeddings.embed_query(query)], dtype=np.float32)
+        faiss.normalize_L2(query_vector)
+        _, ids = self.index.search(query_vector, self.k)
+        return [Document(page_content=self.texts[i]) for i in ids[0] if i != -1]
+
+
+class MmapPassages:
+    """Read-only ``key -> passage text`` mapping backed by a memory-mapped file.
+
+    All passages are stored UTF-8 encoded back to back in ``passages.bin``;
+    ``offsets.npy`` holds the byte offset where each one starts (plus the end
+    of the last one) and ``keys.pkl`` maps a passage key to its position.
+    Only the passages that are actually looked up get paged into memory.
+    """
+    def __init__(self, path: Path):
+        """Open passages saved with :meth:`dump` in the ``path`` directory."""
+        with open(str(path / "keys.pkl"), "rb") as f:
+            self.keys = pickle.load(f)
+        self.offsets = np.load(str(path / "offsets.npy"), mmap_mode="r")
+        with open(str(path / "passages.bin"), "rb") as f:
+            self.buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    @staticmethod
+    def dump(passages: Dict[str, str], path: Path) -> None:
+        """Write ``passages`` to the ``path`` directory in the memory-mappable layout."""
+        path.mkdir(parents=True, exist_ok=True)
+        encoded = [text.encode("utf-8") for text in passages.values()]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(b) for b in encoded], out=offsets[1:])
+
+        with open(str(path / "passages.bin"), "wb") as f:
+            for b in encoded:
+                f.write(b)
+        np.save(str(path / "offsets.npy"), offsets)
+        with open(str(path / "keys.pkl"), "wb") as f:
+            pickle.dump({key: i for i, key in enumerate(passages)}, f)
+
+    def __getitem__(self, key: str) -> str:
+        """Return the passage text stored under ``key``."""
+        i = self.keys[key]
+        return self.buffer[self.offsets[i]:self.offsets[i + 1]].decode("utf-8")
+
 
 class Storage:
     """In-memory storage and retriever for HybridQA tables.
@@ -36,10 +183,24 @@ class Storage:
         self.data_dir = Path("./data")
         self.table_vectorstore_dir = self.data_dir / "table_vector_store"
         self.wiki_vectorstore_dir = self.data_dir / "wiki_vector_store"
+        self.table_index_dir = self.data_dir / "table_hnsw_index"
+        self.wiki_index_dir = self.data_dir / "wiki_hnsw_index"
+        self.embedding_cache_dir = self.data_dir / "emb_cache"
         self.tables_dir = self.data_dir / "tables.pkl"
-        self.passages_dir = self.data_dir / "passages.pkl"
+        self.passages_dir = self.data_dir / "passages"
+        legacy_passages_dir = self.data_dir / "passages.pkl"
+
+        # Convert passages pickled by older versions instead of rebuilding everything
+        if legacy_passages_dir.exists() and not self.passages_dir.exists():
+            with open(str(legacy_passages_dir), "rb") as f:
+                MmapPassages.dump(pickle.load(f), self.passages_dir)
 
         self.tables = {}
+        self._prefetch_pool = ThreadPoolExecutor(max_workers=4)
+
+        # A single client (and connection pool) serves every embeddings request
+        self.embeddings = OpenAIEmbeddings(model="text-embedding-3-small", dimensions=256, chunk_size=1000)
+        self.query_embeddings = self._with_query_cache(self.embeddings)
 
         # Загружаем или создаём и сохраняем векторное хранилище с эмбедингами
         if (
@@ -49,17 +210,13 @@ class Storage:
             and self.tables_dir.exists() 
             and self.passages_dir.exists()
         ):
-            table_embeddings = OpenAIEmbeddings(model="text-embedding-3-small", dimensions=256)
-            table_vectorstore = InMemoryVectorStore.load(str(self.table_vectorstore_dir), table_embeddings)
-
-            wiki_embeddings = OpenAIEmbeddings(model="text-embedding-3-small", dimensions=256)
-            wiki_vectorstore = InMemoryVectorStore.load(str(self.wiki_vectorstore_dir), wiki_embeddings)
+            self.table_retriever = self._load_retriever(self.table_index_dir, self.table_vectorstore_dir)
+            self.wiki_retriever = self._load_retriever(self.wiki_index_dir, self.wiki_vectorstore_dir)
 
             with open(str(self.tables_dir), "rb") as f:
                 self.tables = pickle.load(f)
 
-            with open(str(self.passages_dir), "rb") as f:
-                self.passages = pickle.load(f)
+            self.passages = MmapPassages(self.passages_dir)
         else:
             if not Path("./data/hybrid_qa").exists():
                 class CloneProgress(RemoteProgress):
@@ -74,13 +231,40 @@ class Storage:
                 )
 
             table_vectorstore = self._create_table_vectorstore()
-            wiki_vectorstore = self._create_wiki_vectorstore()
+            self.table_retriever = HNSWRetriever.from_vectorstore(table_vectorstore, self.query_embeddings)
+            self.table_retriever.dump(self.table_index_dir)
 
-        self.table_retriever = table_vectorstore.as_retriever()
-        self.wiki_retriever = wiki_vectorstore.as_retriever()
+            wiki_vectorstore = self._create_wiki_vectorstore()
+            self.wiki_retriever = HNSWRetriever.from_vectorstore(wiki_vectorstore, self.query_embeddings)
+            self.wiki_retriever.dump(self.wiki_index_dir)
 
         print("\n\n\n Storage is ready \n\n\n")
 
+    def _with_query_cache(self, embeddings: Embeddings) -> Embeddings:
+        """Wrap ``embeddings`` so query embeddings are cached on disk by exact query text.
+
+        Agents often repeat the same retrieval query across turns and sessions;
+        a cache hit skips the embeddings API round trip. Document embeddings are
+        not persisted (the vector stores already hold them).
+        """
+        return CacheBackedEmbeddings.from_bytes_store(
+            embeddings,
+            InMemoryByteStore(),
+            namespace="text-embedding-3-small-256",
+            query_embedding_cache=LocalFileStore(str(self.embedding_cache_dir)),
+            key_encoder="blake2b",
+        )
+
+    def _load_retriever(self, index_dir: Path, vectorstore_dir: Path) -> HNSWRetriever:
+        """Load a saved HNSW index, building it from the dumped vector store if missing."""
+        if index_dir.exists():
+            return HNSWRetriever.load(index_dir, self.query_embeddings)
+
+        vectorstore = InMemoryVectorStore.load(str(vectorstore_dir), self.embeddings)
+        retriever = HNSWRetriever.from_vectorstore(vectorstore, self.query_embeddings)
+        retriever.dump(index_dir)
+        return retriever
+
     def _create_table_vectorstore(self):
         table_uids = set()
         for table_path in Path("./data/hybrid_qa/tables_tok").iterdir():
@@ -89,8 +273,7 @@ class Storage:
         table_uids = list(table_uids)
             
         print("\n\n\n Creating Table VectorStore \n\n\n")
-        embeddings = OpenAIEmbeddings(chunk_size=1000, model="text-embedding-3-small", dimensions=256)
-        vectorstore = InMemoryVectorStore.from_texts(table_uids, embedding=embeddings)
+        vectorstore = InMemoryVectorStore.from_texts(table_uids, embedding=self.embeddings)
         print("\n\n\n Table VectorStore is created \n\n\n")
 
         self.data_dir.mkdir(parents=True, exist_ok=True)
@@ -101,19 +284,23 @@ class Storage:
         return vectorstore
 
     def _create_wiki_vectorstore(self):
-        self.passages = {}
-        for passages_path in Path("./data/hybrid_qa/request_tok").iterdir():
-            with open(passages_path, "r") as f:
-                self.passages.update(json.load(f))
+        passages = {}
+        # Thousands of small files: a thread pool overlaps the file reads (parsing itself holds the GIL)
+        with ThreadPoolExecutor() as executor:
+            parsed = executor.map(
+                lambda passages_path: orjson.loads(passages_path.read_bytes()),
+                Path("./data/hybrid_qa/request_tok").iterdir(),
+            )
+            for file_passages in parsed:
+                passages.update(file_passages)
             
         print("\n\n\n Creating Wiki-Passage VectorStore \n\n\n")
-        embeddings = OpenAIEmbeddings(chunk_size=1000, model="text-embedding-3-small", dimensions=256)
-        vectorstore = InMemoryVectorStore.from_texts(self.passages.keys(), embedding=embeddings)
+        vectorstore = InMemoryVectorStore.from_texts(passages.keys(), embedding=self.embeddings)
         print("\n\n\n Wiki-Passage VectorStore is created \n\n\n")
 
         self.data_dir.mkdir(parents=True, exist_ok=True)
-        with open(str(self.passages_dir), "wb") as f:
-            pickle.dump(self.passages, f)
+        MmapPassages.dump(passages, self.passages_dir)
+        self.passages = MmapPassages(self.passages_dir)
         vectorstore.dump(str(self.wiki_vectorstore_dir))
 
         return vectorstore
@@ -134,8 +321,7 @@ class Storage:
         if table_uid not in self.tables:
             raise ValueError(f"Table with uid: '{table_uid}' not found")
 
-        with open(self.tables[table_uid], "r") as f:
-            return json.load(f)
+        return _load_table(str(self.tables[table_uid]))
 
     def retrieve_tables(self, query: str) -> list[str]:
         """Retrieve candidate table UIDs relevant to a natural-language query.
@@ -151,13 +337,33 @@ class Storage:
         Returns:
             A list of table UIDs ordered by relevance to the query.
         """
+        table_uids = list(self._retrieve_tables_cached(query))
+
+        # The table agent usually inspects the top hits next: warm the table
+        # cache in the background while the LLM is still thinking
+        for table_uid in table_uids[:4]:
+            self._prefetch_pool.submit(self.get_table, table_uid)
+
+        return table_uids
+
+    async def aretrieve_tables(self, query: str) -> list[str]:
+        """Async variant of :meth:`retrieve_tables`.
+
+        Runs the lookup in a worker thread so that several retrievals issued
+        in the same agent turn (tables and wiki passages) run concurrently
+        while still sharing the per-query result cache.
+        """
+        return await asyncio.to_thread(self.retrieve_tables, query)
+
+    @functools.lru_cache(maxsize=256)
+    def _retrieve_tables_cached(self, query: str) -> tuple[str, ...]:
         retrieved_documents = self.table_retriever.invoke(query)
 
         table_uids = []
         for doc in retrieved_documents:
             table_uids.append(doc.page_content)
 
-        return table_uids
+        return tuple(table_uids)
 
     def retrieve_wiki_passages(self, query: str) -> list[str]:
         """Retrieve Wikipedia passage texts relevant to a natural-language query.
@@ -176,21 +382,64 @@ class Storage:
             The number of passages is limited by the retriever configuration
             (e.g. load_max_docs).
         """
+        return list(self._retrieve_wiki_passages_cached(query))
+
+    async def aretrieve_wiki_passages(self, query: str) -> list[str]:
+        """Async variant of :meth:`retrieve_wiki_passages`."""
+        return await asyncio.to_thread(self.retrieve_wiki_passages, query)
+
+    @functools.lru_cache(maxsize=256)
+    def _retrieve_wiki_passages_cached(self, query: str) -> tuple[str, ...]:
         retrieved_documents = self.wiki_retriever.invoke(query)
 
         passages_texts = []
         for doc in retrieved_documents:
             passages_texts.append(self.passages[doc.page_content])
 
-        return passages_texts
+        return tuple(passages_texts)
 
-STORAGE = None
+def _start_storage_build() -> Future[Storage]:
+    """Build Storage in a daemon thread and return a future for the result.
 
-def get_storage():
-    global STORAGE
-    if STORAGE is None:
-        STORAGE = Storage()
-    return STORAGE
+    The thread is a daemon so an unfinished build (cloning the dataset,
+    embedding the corpus) never keeps a short-lived process from exiting.
+    """
+    future: Future[Storage] = Future()
+
+    def build() -> None:
+        if not future.set_running_or_notify_cancel():
+            return
+        try:
+            future.set_result(Storage())
+        except BaseException as e:
+            future.set_exception(e)
+
+    threading.Thread(target=build, name="storage-build", daemon=True).start()
+    return future
+
+# Storage is built in a background thread as soon as this module is imported,
+# so loading embeddings and vector stores overlaps with server start-up instead
+# of blocking the first request.
+_STORAGE_FUTURE = _start_storage_build()
+_STORAGE_LOCK = threading.Lock()
+
+def get_storage() -> Storage:
+    global _STORAGE_FUTURE
+    future = _STORAGE_FUTURE
+    try:
+        return future.result()
+    except Exception:
+        # A failed build (e.g. a transient clone or embeddings API error) is
+        # not cached: start a new one, unless another caller already did
+        with _STORAGE_LOCK:
+            if _STORAGE_FUTURE is future:
+                _STORAGE_FUTURE = _start_storage_build()
+            future = _STORAGE_FUTURE
+        return future.result()
+
+async def aget_storage() -> Storage:
+    """Async variant of :func:`get_storage` that waits for Storage off the event loop."""
+    return await asyncio.to_thread(get_storage)
 
 
 def validate_input(input_state: MessagesState) -> State: